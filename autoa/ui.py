@@ -4,17 +4,37 @@ from __future__ import annotations
 import csv
 import locale
 import os
+import queue
 import random
 import subprocess
 import sys
 import threading
 import time
+import traceback
 from collections import deque
+from dataclasses import dataclass
+from functools import lru_cache
 import cv2
 import numpy as np
 
+try:
+    import mss
+except ImportError:  # 未安裝 mss 時退回 pyautogui 截圖
+    mss = None
+
+# pyautogui 匯入時會初始化滑鼠/螢幕相關模組，在啟動時做一次，避免每次流程開始時阻塞
+try:
+    import pyautogui as _pyautogui
+except Exception as _exc:  # 缺少套件或無法存取桌面時仍可開啟介面，操作時再提示
+    _pyautogui = None
+    _PYAUTOGUI_IMPORT_ERROR: Exception | None = _exc
+else:
+    _PYAUTOGUI_IMPORT_ERROR = None
+    # 流程中每個動作後都有明確的等待，不需要 pyautogui 預設每次呼叫後再睡 0.1 秒
+    _pyautogui.PAUSE = 0
+
 from pathlib import Path
-from typing import Any, Iterable
+from typing import Any, Callable, Iterable
 
 import tkinter as tk
 from tkinter import filedialog, messagebox, ttk
@@ -41,9 +61,143 @@ STATUS_COLORS = {
 }
 
 LOG_CAPACITY = 200
+LOG_FLUSH_INTERVAL_MS = 100  # 日誌框批次更新間隔
+UI_STATE_FLUSH_MS = 50  # 背景執行緒進度/步驟更新的合併間隔
 LINE_REFRESH_MS = 5000
 TEMPLATE_CONFIDENCE = 0.88
+LAST_HIT_MARGIN = 120  # _try_locate 先在上次命中位置外擴此距離的範圍內搜尋（像素）
+LAST_HIT_CONFIDENCE = 0.97  # 上次命中範圍內的結果需達此分數才採用，否則改搜整個區域取最佳者
 MAX_CHAT_TEST_RECIPIENTS = 8
+SCREENSHOT_PNG_COMPRESSION = 3
+FRAME_CACHE_TTL = 0.1  # 秒；同一時間窗內的模板比對共用一張截圖
+PYRAMID_MIN_TEMPLATE = 24  # 模板短邊小於此值時不建立縮小層
+PYRAMID_MIN_AREA_RATIO = 16  # 搜尋區域面積需大於模板面積此倍數才走金字塔
+PYRAMID_CANDIDATES = 3  # 粗比對階段保留的候選數
+PYRAMID_MARGIN = 4  # 精比對時候選位置周圍的容許像素（每多縮一層加倍）
+PYRAMID_MAX_LEVELS = 2  # 金字塔最多縮小幾層（2 層為 1/4 解析度）
+OPENCL_MIN_PIXELS = 640 * 480  # 搜尋區域至少此像素數才走 OpenCL，小區域的上傳/下載成本高於運算
+FLAT_TEMPLATE_STDDEV = 4.0  # 灰階標準差不超過此值視為低紋理模板
+FLAT_TEMPLATE_RANGE = 16  # 低紋理且明暗差不超過此值時直接略過比對
+FLAT_TEMPLATE_MEAN_DELTA = 10.0  # 低紋理模板比對時，區域平均灰階與模板相差超過此值即視為不相符
+
+
+@dataclass
+class TemplateEntry:
+    """已解碼的灰階模板與金字塔縮小層。"""
+
+    mtime: float
+    gray: np.ndarray
+    levels: tuple[np.ndarray, ...]  # 依序 cv2.pyrDown 的縮小層（最多 PYRAMID_MAX_LEVELS 層）；模板太小時為空
+    stddev: float
+    dynamic_range: int
+    offset: tuple[int, int]  # 依透明邊界裁切後，gray 左上角在原圖中的 (x, y)
+    size: tuple[int, int]  # 原圖的 (寬, 高)，回傳的命中框以此為準
+    umat: cv2.UMat | None = None  # OpenCL 可用時預先上傳的 gray，比對時不必每次重新上傳
+
+    @property
+    def is_blank(self) -> bool:
+        """模板幾乎沒有紋理，任何比對方法都無法可靠區分"""
+        return self.stddev <= FLAT_TEMPLATE_STDDEV and self.dynamic_range <= FLAT_TEMPLATE_RANGE
+
+    @property
+    def match_method(self) -> int:
+        # 低紋理模板的 CCOEFF 分母趨近 0，改用平方差較能區分
+        return cv2.TM_SQDIFF_NORMED if self.stddev <= FLAT_TEMPLATE_STDDEV else cv2.TM_CCOEFF_NORMED
+
+
+@lru_cache(maxsize=1)
+def _toolhelp_api() -> tuple[Any, type] | None:
+    """載入 kernel32 的 Toolhelp 行程列舉 API；非 Windows 時回傳 None"""
+    if sys.platform != "win32":
+        return None
+    import ctypes
+    from ctypes import wintypes
+
+    class PROCESSENTRY32W(ctypes.Structure):
+        _fields_ = [
+            ("dwSize", wintypes.DWORD),
+            ("cntUsage", wintypes.DWORD),
+            ("th32ProcessID", wintypes.DWORD),
+            ("th32DefaultHeapID", ctypes.c_size_t),
+            ("th32ModuleID", wintypes.DWORD),
+            ("cntThreads", wintypes.DWORD),
+            ("th32ParentProcessID", wintypes.DWORD),
+            ("pcPriClassBase", ctypes.c_long),
+            ("dwFlags", wintypes.DWORD),
+            ("szExeFile", ctypes.c_wchar * 260),
+        ]
+
+    kernel32 = ctypes.WinDLL("kernel32", use_last_error=True)
+    kernel32.CreateToolhelp32Snapshot.argtypes = [wintypes.DWORD, wintypes.DWORD]
+    kernel32.CreateToolhelp32Snapshot.restype = wintypes.HANDLE
+    for name in ("Process32FirstW", "Process32NextW"):
+        func = getattr(kernel32, name)
+        func.argtypes = [wintypes.HANDLE, ctypes.POINTER(PROCESSENTRY32W)]
+        func.restype = wintypes.BOOL
+    kernel32.CloseHandle.argtypes = [wintypes.HANDLE]
+    return kernel32, PROCESSENTRY32W
+
+
+def _process_running(image_name: str) -> bool | None:
+    """以 CreateToolhelp32Snapshot 在程序內列舉行程，不必啟動 tasklist
+
+    Returns:
+        是否有同名行程（不分大小寫）；無法使用 Toolhelp API 時為 None
+    """
+    api = _toolhelp_api()
+    if api is None:
+        return None
+    import ctypes
+
+    kernel32, entry_type = api
+    snapshot = kernel32.CreateToolhelp32Snapshot(0x00000002, 0)  # TH32CS_SNAPPROCESS
+    if not snapshot or snapshot == ctypes.c_void_p(-1).value:  # INVALID_HANDLE_VALUE
+        return None
+    try:
+        entry = entry_type()
+        entry.dwSize = ctypes.sizeof(entry_type)
+        target = image_name.casefold()
+        ok = kernel32.Process32FirstW(snapshot, ctypes.byref(entry))
+        while ok:
+            if entry.szExeFile.casefold() == target:
+                return True
+            ok = kernel32.Process32NextW(snapshot, ctypes.byref(entry))
+        return False
+    finally:
+        kernel32.CloseHandle(snapshot)
+
+
+@lru_cache(maxsize=1)
+def _user_locale_name() -> str | None:
+    """回傳使用者語系代碼（例如 zh-TW）；Windows 直接查詢 GetUserDefaultLocaleName，結果快取"""
+    if sys.platform == "win32":
+        import ctypes
+
+        buffer = ctypes.create_unicode_buffer(85)  # LOCALE_NAME_MAX_LENGTH
+        if ctypes.windll.kernel32.GetUserDefaultLocaleName(buffer, len(buffer)):
+            return buffer.value
+    # locale.getdefaultlocale 已棄用，其他平台改用目前的 LC_CTYPE
+    return locale.getlocale(locale.LC_CTYPE)[0]
+
+
+def _score_map(
+    image: np.ndarray,
+    template: np.ndarray,
+    method: int,
+    out: np.ndarray | None = None,
+) -> np.ndarray:
+    """執行 matchTemplate，並統一為「分數越高越相符」；out 為可重用的結果緩衝區"""
+    result = cv2.matchTemplate(image, template, method, result=out)
+    if method == cv2.TM_SQDIFF_NORMED:
+        np.subtract(1.0, result, out=result)
+        # 正規化平方差對整體亮度差異不敏感（灰 200 的模板對純白面板也有約 0.94），
+        # 以積分圖算出各位置的區域平均灰階，與模板平均相差過大者直接判為 0 分
+        h, w = template.shape[:2]
+        sums = cv2.integral(image, sdepth=cv2.CV_64F)
+        window_sums = sums[h:, w:] - sums[:-h, w:] - sums[h:, :-w] + sums[:-h, :-w]
+        mismatched = np.abs(window_sums / (h * w) - float(template.mean())) > FLAT_TEMPLATE_MEAN_DELTA
+        result[mismatched] = 0.0
+    return result
 
 
 class AutoaApp:
@@ -64,24 +218,47 @@ class AutoaApp:
         self.throttle_max_var = tk.StringVar(value="2.0")
         self.current_step_var = tk.StringVar(value="閒置")
         self.progress_var = tk.DoubleVar(value=0.0)
+        # 背景執行緒尚未套用到 Tk 變數的步驟/進度，由 _flush_ui_state 合併套用
+        self._ui_state_lock = threading.Lock()
+        self._pending_step: str | None = None
+        self._pending_progress: float | None = None
+        self._ui_flush_scheduled = False
 
         self.running = False
         self.paused = False
         self.stop_event = threading.Event()
-        self.pause_condition = threading.Condition()
-        self.worker_thread: threading.Thread | None = None
+        self._resume_event = threading.Event()  # 未暫停時為 set；暫停時 clear，工作執行緒阻塞於 wait()
+        self._resume_event.set()
+        # 常駐工作執行緒：流程與測試依序從佇列取出執行；None 通知結束
+        self._job_queue: queue.SimpleQueue[Callable[[], None] | None] = queue.SimpleQueue()
+        self._job_idle = threading.Event()  # 佇列清空且沒有工作執行中時為 set
+        self._job_idle.set()
+        self._job_lock = threading.Lock()
+        self._pending_jobs = 0  # 已提交但尚未執行完的工作數，由 _job_lock 保護
+        threading.Thread(target=self._worker_loop, name="autoa-worker", daemon=True).start()
 
         self.log_text: tk.Text | None = None
         self.progress_bar: ttk.Progressbar | None = None
         self.log_lines: deque[str] = deque(maxlen=LOG_CAPACITY)
+        self._log_queue: queue.SimpleQueue[str] = queue.SimpleQueue()  # 待寫入日誌框的行，由 _flush_logs 批次處理
+        self._log_ts_cache: tuple[int, str] = (-1, "")  # (epoch 秒, 格式化後時間)
 
         self.start_button: ttk.Button | None = None
         self.pause_button: ttk.Button | None = None
         self.stop_button: ttk.Button | None = None
         self.screenshot_button: ttk.Button | None = None
-        self.friend_cycle_thread: threading.Thread | None = None
+
+        # 灰階螢幕畫面快取：(擷取時間, 灰階畫面)
+        self._frame_cache: tuple[float, np.ndarray] | None = None
+        self._frame_lock = threading.Lock()
+        self._pyautogui = _pyautogui
+        self._line_window_cache: Any = None  # 上次找到的 LINE 視窗（pygetwindow 物件），由 _line_window 驗證後沿用
+        # 各執行緒自有的 mss 實例與 matchTemplate 結果緩衝區（mss 綁定建立它的執行緒）
+        self._thread_local = threading.local()
+        cv2.setUseOptimized(True)
 
         self.system_status_labels: dict[str, tk.Label] = {}
+        self._status_label_state: dict[tk.Label, tuple[str, str]] = {}  # 標籤目前的 (文字, 背景色)
         self.system_status: dict[str, bool] = {
             "resolution": False,
             "dpi": False,
@@ -92,6 +269,12 @@ class AutoaApp:
         # 模板會根據主題動態加載
         self.friend_list_template = None
         self.message_cube_template = None
+        self._template_path_list: tuple[Path, ...] = ()
+        # 已解碼的灰階模板（以 mtime 判斷是否需重新讀取）
+        self._template_cache: dict[Path, TemplateEntry] = {}
+        self._template_dir_names: dict[Path, set[str]] = {}  # 模板目錄 -> 檔名（casefold），由 _has_template 填入
+        self._last_hits: dict[Path, tuple[int, int, int, int]] = {}  # 各模板上次全螢幕命中的位置
+        self._dib_cache: dict[str, tuple[float, bytes]] = {}  # 附加圖片路徑 -> (mtime, 剪貼簿 DIB 資料)
 
         # 綁定主題變更事件
         self.theme_var.trace_add('write', self._on_theme_changed)
@@ -101,6 +284,10 @@ class AutoaApp:
         self.root.protocol("WM_DELETE_WINDOW", self._on_close)
 
         self._build_ui()
+        self._flush_logs()
+        if self._pyautogui is None:
+            self.append_log(f"無法載入 pyautogui：{_PYAUTOGUI_IMPORT_ERROR}，自動化功能將無法使用。")
+        self._log_opencv_backends()
         self._load_templates()  # 初始加載模板
         self.run_system_checks()
         self.refresh_line_status()
@@ -118,6 +305,13 @@ class AutoaApp:
 
         self.friend_list_template = get_resource_path(f"templates/{prefix}friend-list.png")
         self.message_cube_template = get_resource_path(f"templates/{prefix}message_cube.png")
+        # 模板清單只隨主題變動，在此預先建好
+        self._template_path_list = tuple(
+            path for path in (self.friend_list_template, self.message_cube_template) if path
+        )
+        # 先解碼並快取模板，第一次比對時不必再讀檔
+        for path in self._template_path_list:
+            self._load_template(path)
 
     # ------------------------------------------------------------------
     def _build_ui(self) -> None:
@@ -283,24 +477,44 @@ class AutoaApp:
         )
     # ------------------------------------------------------------------
     def append_log(self, message: str) -> None:
-        if threading.current_thread() is not threading.main_thread():
-            self.root.after(0, lambda: self.append_log(message))
-            return
+        """加入一行日誌；任何執行緒皆可呼叫，實際寫入由 _flush_logs 在主執行緒批次完成"""
+        self._log_queue.put(f"[{self._log_timestamp()}] {message}")
 
-        timestamp = time.strftime("%H:%M:%S")
-        line = f"[{timestamp}] {message}"
-        self.log_lines.append(line)
+    def _flush_logs(self) -> None:
+        """每 LOG_FLUSH_INTERVAL_MS 將佇列中的日誌一次附加到日誌框末端"""
+        pending: list[str] = []
+        while True:
+            try:
+                line = self._log_queue.get_nowait()
+            except queue.Empty:
+                break
+            self.log_lines.append(line)
+            pending.append(line)
+
+        self.root.after(LOG_FLUSH_INTERVAL_MS, self._flush_logs)
 
-        if self.log_text is None:
+        if not pending or self.log_text is None:
             return
 
+        # 只附加新行，超過 LOG_CAPACITY 行時從頂端裁掉，不重繪整個日誌框
         self.log_text.configure(state="normal")
-        self.log_text.delete("1.0", "end")
-        self.log_text.insert("end", "\n".join(self.log_lines) + "\n")
+        self.log_text.insert("end", "\n".join(pending) + "\n")
+        excess = int(self.log_text.index("end-1c").split(".")[0]) - 1 - LOG_CAPACITY
+        if excess > 0:
+            self.log_text.delete("1.0", f"{excess + 1}.0")
         self.log_text.configure(state="disabled")
         self.log_text.see("end")
 
 
+    def _log_timestamp(self) -> str:
+        """回傳目前時間字串，同一秒內重複使用已格式化的結果"""
+        now = int(time.time())
+        cached_sec, cached_text = self._log_ts_cache
+        if now != cached_sec:
+            cached_text = time.strftime("%H:%M:%S", time.localtime(now))
+            self._log_ts_cache = (now, cached_text)
+        return cached_text
+
     def browse_image(self) -> None:
         selected = filedialog.askopenfilename(
             title="選擇圖片檔案",
@@ -331,8 +545,7 @@ class AutoaApp:
         except tk.TclError:
             dpi = 96
 
-        locale_info = locale.getdefaultlocale()
-        locale_code = locale_info[0] if locale_info and locale_info[0] else "未知"
+        locale_code = _user_locale_name() or "未知"
 
         resolution_ok = width == 1920 and height == 1080
         dpi_ok = 94 <= dpi <= 110
@@ -364,7 +577,12 @@ class AutoaApp:
     def _update_status_label(self, label: tk.Label | None, state: str, text: str) -> None:
         if label is None:
             return
-        label.configure(text=text, bg=STATUS_COLORS.get(state, STATUS_COLORS["pending"]))
+        bg = STATUS_COLORS.get(state, STATUS_COLORS["pending"])
+        previous = self._status_label_state.get(label)
+        if previous == (text, bg):
+            return  # 內容與顏色都沒變，不必重設
+        label.configure(text=text, bg=bg)
+        self._status_label_state[label] = (text, bg)
 
     def refresh_line_status(self) -> None:
         running = self._is_line_running()
@@ -376,6 +594,14 @@ class AutoaApp:
         self.root.after(LINE_REFRESH_MS, self.refresh_line_status)
 
     def _is_line_running(self) -> bool:
+        """LINE 是否執行中；以 Toolhelp API 列舉行程，無法使用時改呼叫 tasklist"""
+        running = _process_running("line.exe")
+        if running is None:
+            running = self._tasklist_has_line()
+        return running
+
+    def _tasklist_has_line(self) -> bool:
+        """Toolhelp API 無法使用時的備援：呼叫 tasklist 查詢"""
         try:
             # 使用 CREATE_NO_WINDOW 避免 CMD 視窗閃動
             result = subprocess.run(
@@ -394,6 +620,9 @@ class AutoaApp:
         if self.running:
             messagebox.showinfo("執行中", "流程已在執行。")
             return
+        if not self._job_idle.is_set():
+            messagebox.showinfo("執行中", "測試仍在進行中，請稍候。")
+            return
 
         # 不再需要收件者驗證，直接使用好友列表
         message = ""
@@ -414,7 +643,7 @@ class AutoaApp:
 
         # 呼叫 LINE 視窗到最上層
         try:
-            import pyautogui
+            pyautogui = self._require_pyautogui()
         except ImportError as exc:
             messagebox.showerror("測試失敗", f"無法載入 pyautogui：{exc}")
             return
@@ -426,6 +655,7 @@ class AutoaApp:
         self.stop_event = threading.Event()
         self.running = True
         self.paused = False
+        self._resume_event.set()
 
         if self.pause_button is not None:
             self.pause_button.configure(text="暫停")
@@ -436,12 +666,31 @@ class AutoaApp:
 
         # 不再使用收件者，使用空字符串
         recipient = ""
-        self.worker_thread = threading.Thread(
-            target=self._run_flow,
-            args=(recipient, message, image_path, throttle, dry_run),
-            daemon=True,
-        )
-        self.worker_thread.start()
+        self._submit_job(lambda: self._run_flow(recipient, message, image_path, throttle, dry_run))
+
+    def _submit_job(self, job: Callable[[], None]) -> None:
+        """交給常駐工作執行緒執行"""
+        with self._job_lock:
+            self._pending_jobs += 1
+            self._job_idle.clear()
+        self._job_queue.put(job)
+
+    def _worker_loop(self) -> None:
+        """常駐工作執行緒：依序執行佇列中的工作，收到 None 時結束"""
+        while True:
+            job = self._job_queue.get()
+            if job is None:
+                return
+            try:
+                job()
+            except Exception as exc:
+                self.append_log(f"背景工作發生未預期錯誤：{exc}")
+            finally:
+                # 以計數判斷是否閒置：檢查佇列是否為空會與 _submit_job 的 clear/put 競爭
+                with self._job_lock:
+                    self._pending_jobs -= 1
+                    if self._pending_jobs == 0:
+                        self._job_idle.set()
 
     def _toggle_buttons(self, running: bool) -> None:
         if self.start_button is not None:
@@ -454,26 +703,25 @@ class AutoaApp:
     def handle_pause(self) -> None:
         if not self.running:
             return
-        with self.pause_condition:
-            self.paused = not self.paused
-            if self.paused:
-                if self.pause_button is not None:
-                    self.pause_button.configure(text="繼續")
-                self.append_log("流程已暫停。")
-            else:
-                if self.pause_button is not None:
-                    self.pause_button.configure(text="暫停")
-                self.pause_condition.notify_all()
-                self.append_log("流程繼續。")
+        self.paused = not self.paused
+        if self.paused:
+            self._resume_event.clear()
+            if self.pause_button is not None:
+                self.pause_button.configure(text="繼續")
+            self.append_log("流程已暫停。")
+        else:
+            if self.pause_button is not None:
+                self.pause_button.configure(text="暫停")
+            self._resume_event.set()
+            self.append_log("流程繼續。")
 
     def handle_stop(self) -> None:
         if not self.running:
             return
         self.append_log("收到終止指令，準備停止流程。")
         self.stop_event.set()
-        with self.pause_condition:
-            self.paused = False
-            self.pause_condition.notify_all()
+        self.paused = False
+        self._resume_event.set()  # 喚醒暫停中的工作執行緒，讓它看到終止信號
 
     def _run_flow(
         self,
@@ -485,10 +733,10 @@ class AutoaApp:
     ) -> None:
         """主流程：批量發送訊息給好友列表（手動模式）"""
         try:
-            import pyautogui
+            pyautogui = self._require_pyautogui()
         except ImportError as exc:
             self.append_log(f"無法載入 pyautogui：{exc}")
-            self.root.after(0, lambda: messagebox.showerror('執行失敗', f'無法載入 pyautogui：{exc}'))
+            self._post_main(lambda: messagebox.showerror('執行失敗', f'無法載入 pyautogui：{exc}'))
             self.root.after(0, lambda: self._on_worker_finished(False))
             return
 
@@ -509,7 +757,7 @@ class AutoaApp:
             self.append_log("步驟 1/3：聚焦 LINE 視窗")
             if not self._focus_line_window(pyautogui):
                 self.append_log("未偵測到 LINE 視窗")
-                self.root.after(0, lambda: messagebox.showwarning('執行失敗', '未偵測到 LINE 視窗。'))
+                self._post_main(lambda: messagebox.showwarning('執行失敗', '未偵測到 LINE 視窗。'))
                 self.root.after(0, lambda: self._on_worker_finished(False))
                 return
 
@@ -531,7 +779,7 @@ class AutoaApp:
                 )
                 confirmed[0] = result
 
-            self.root.after(0, show_confirm)
+            self._post_main(show_confirm)
 
             # 等待用戶確認
             while confirmed[0] is None:
@@ -552,6 +800,9 @@ class AutoaApp:
                 self.root.after(0, lambda: self._on_worker_finished(False))
                 return
 
+            # 訊息輸入框只會出現在 LINE 視窗內，之後只在此範圍搜尋（取不到時退回全螢幕）
+            line_region = self._get_line_window_region(pyautogui)
+
             # 4. 開始循環處理每個好友
             self._set_current_step("發送訊息中")
             sent_count = 0
@@ -574,7 +825,9 @@ class AutoaApp:
 
                 # 聚焦：偵測 message_cube.png 並點擊中央
                 self.append_log(f"  → 偵測訊息輸入框以恢復焦點")
-                message_cube_location = self._try_locate(pyautogui, self.message_cube_template, confidence=0.85)
+                message_cube_location = self._try_locate(
+                    pyautogui, self.message_cube_template, region=line_region, confidence=0.85
+                )
                 if message_cube_location:
                     cube_coords = self._box_to_tuple(message_cube_location)
                     if cube_coords:
@@ -596,7 +849,7 @@ class AutoaApp:
                                 f'第 {current_num} 位好友：無法解析訊息輸入框位置。\n\n是否繼續處理下一位好友？'
                             )
                             should_continue[0] = result
-                        self.root.after(0, ask_continue)
+                        self._post_main(ask_continue)
                         while should_continue[0] is None:
                             if self.stop_event.is_set():
                                 self.append_log("用戶中止流程")
@@ -614,7 +867,7 @@ class AutoaApp:
                     if consecutive_failures >= MAX_CONSECUTIVE_FAILURES:
                         error_msg = f'連續 {consecutive_failures} 次無法找到訊息輸入框，流程自動終止。\n\n可能原因：\n1. LINE 視窗被遮擋\n2. 主題選擇錯誤（請確認使用正確的主題）\n3. 模板圖片不匹配'
                         self.append_log(f"✗ {error_msg}")
-                        self.root.after(0, lambda: messagebox.showerror('流程終止', error_msg))
+                        self._post_main(lambda: messagebox.showerror('流程終止', error_msg))
                         self.root.after(0, lambda: self._on_worker_finished(False))
                         return
 
@@ -626,7 +879,7 @@ class AutoaApp:
                             f'第 {current_num} 位好友：找不到訊息輸入框（連續失敗 {consecutive_failures}/{MAX_CONSECUTIVE_FAILURES} 次）。\n\n可能原因：\n1. LINE 視窗被遮擋\n2. 主題選擇錯誤\n3. 聊天視窗未完全開啟\n\n是否繼續處理下一位好友？'
                         )
                         should_continue[0] = result
-                    self.root.after(0, ask_continue)
+                    self._post_main(ask_continue)
                     while should_continue[0] is None:
                         if self.stop_event.is_set():
                             self.append_log("用戶中止流程")
@@ -638,7 +891,14 @@ class AutoaApp:
                     continue
 
                 # 發送訊息
-                send_result = self._send_message_to_current_chat(pyautogui, message, image_path, dry_run)
+                # 沿用剛才定位到的輸入框位置，不再重新截圖比對
+                send_result = self._send_message_to_current_chat(
+                    pyautogui,
+                    message,
+                    image_path,
+                    dry_run,
+                    cube_box=cube_coords,
+                )
                 if send_result:
                     sent_count += 1
                     consecutive_failures = 0  # 重置連續失敗計數器
@@ -651,7 +911,7 @@ class AutoaApp:
                     if consecutive_failures >= MAX_CONSECUTIVE_FAILURES:
                         error_msg = f'連續 {consecutive_failures} 次發送失敗，流程自動終止。'
                         self.append_log(f"✗ {error_msg}")
-                        self.root.after(0, lambda: messagebox.showerror('流程終止', error_msg))
+                        self._post_main(lambda: messagebox.showerror('流程終止', error_msg))
                         self.root.after(0, lambda: self._on_worker_finished(False))
                         return
 
@@ -663,7 +923,7 @@ class AutoaApp:
                             f'第 {current_num} 位好友發送失敗（連續失敗 {consecutive_failures}/{MAX_CONSECUTIVE_FAILURES} 次）。\n\n是否繼續處理下一位好友？'
                         )
                         should_continue[0] = result
-                    self.root.after(0, ask_continue)
+                    self._post_main(ask_continue)
                     while should_continue[0] is None:
                         if self.stop_event.is_set():
                             self.append_log("用戶中止流程")
@@ -704,17 +964,21 @@ class AutoaApp:
             self._set_progress(100.0)
             self._set_current_step("完成")
             self.append_log(f"\n流程完成！處理了 {friend_count} 位好友，發送了 {sent_count} 次訊息")
-            self.root.after(0, lambda: messagebox.showinfo('流程完成',
+            self._post_main(lambda: messagebox.showinfo('流程完成',
                 f'已處理 {friend_count} 位好友\n成功發送 {sent_count} 次訊息'))
             self.root.after(0, lambda: self._on_worker_finished(True))
 
         except Exception as exc:
             self.append_log(f'流程發生錯誤：{exc}')
-            import traceback
             self.append_log(traceback.format_exc())
-            self.root.after(0, lambda err=exc: messagebox.showerror('執行失敗', f'執行失敗：{err}'))
+            self._post_main(lambda err=exc: messagebox.showerror('執行失敗', f'執行失敗：{err}'))
             self.root.after(0, lambda: self._on_worker_finished(False))
 
+    def _post_main(self, fn: Callable[[], None]) -> None:
+        """排程到主執行緒執行；若執行前流程已被終止則略過（避免終止後仍跳出對話框）"""
+        stop_event = self.stop_event  # 每次流程開始都會換新的 Event，先取得本次流程的
+        self.root.after(0, lambda: None if stop_event.is_set() else fn())
+
     def _interruptible_sleep(self, duration: float) -> bool:
         """可中斷的睡眠，定期檢查 stop_event
 
@@ -732,46 +996,69 @@ class AutoaApp:
         return False
 
     def _wait_if_paused(self) -> bool:
-        with self.pause_condition:
-            while self.paused and not self.stop_event.is_set():
-                self.pause_condition.wait(timeout=0.2)
+        """暫停時阻塞直到繼續或終止；回傳是否已收到終止信號"""
+        self._resume_event.wait()
         return self.stop_event.is_set()
 
     def _set_current_step(self, text: str) -> None:
         if threading.current_thread() is threading.main_thread():
+            with self._ui_state_lock:
+                self._pending_step = None  # 直接設定的值優先，丟棄尚未套用的背景更新
             self.current_step_var.set(text)
-        else:
-            self.root.after(0, lambda: self.current_step_var.set(text))
+            return
+        with self._ui_state_lock:
+            self._pending_step = text
+            self._schedule_ui_flush()
 
     def _set_progress(self, value: float) -> None:
         if threading.current_thread() is threading.main_thread():
+            with self._ui_state_lock:
+                self._pending_progress = None
             self.progress_var.set(value)
-        else:
-            self.root.after(0, lambda: self.progress_var.set(value))
+            return
+        with self._ui_state_lock:
+            self._pending_progress = value
+            self._schedule_ui_flush()
+
+    def _schedule_ui_flush(self) -> None:
+        """背景執行緒的進度/步驟更新合併後，每 UI_STATE_FLUSH_MS 最多套用一次（需持有 _ui_state_lock）"""
+        if not self._ui_flush_scheduled:
+            self._ui_flush_scheduled = True
+            self.root.after(UI_STATE_FLUSH_MS, self._flush_ui_state)
+
+    def _flush_ui_state(self) -> None:
+        with self._ui_state_lock:
+            step, progress = self._pending_step, self._pending_progress
+            self._pending_step = self._pending_progress = None
+            self._ui_flush_scheduled = False
+        if step is not None:
+            self.current_step_var.set(step)
+        if progress is not None:
+            self.progress_var.set(progress)
 
     def _on_worker_finished(self, success: bool) -> None:
         if success:
             self.append_log("流程完成。")
-            self.current_step_var.set("完成")
-            self.progress_var.set(100.0)
+            self._set_current_step("完成")
+            self._set_progress(100.0)
         else:
             if self.stop_event.is_set():
                 self.append_log("流程已中止。")
             else:
                 self.append_log("流程未完成。")
-            self.current_step_var.set("閒置")
-            self.progress_var.set(0.0)
+            self._set_current_step("閒置")
+            self._set_progress(0.0)
 
         self.running = False
         self.paused = False
-        self.worker_thread = None
+        self._resume_event.set()
         self._toggle_buttons(running=False)
         if self.pause_button is not None:
             self.pause_button.configure(text="暫停")
     # ------------------------------------------------------------------
     def handle_screenshot(self) -> None:
         try:
-            import pyautogui
+            pyautogui = self._require_pyautogui()
         except ImportError as exc:
             messagebox.showerror("截圖失敗", f"無法載入 pyautogui：{exc}")
             return
@@ -782,8 +1069,10 @@ class AutoaApp:
         output_path = reports_dir / f"screenshot-{timestamp}.png"
 
         try:
-            screenshot = pyautogui.screenshot()
-            screenshot.save(output_path)
+            frame = self._capture_bgr(pyautogui)
+            # 直接走 OpenCV 的 libpng 編碼，壓縮等級 3 比 PIL 預設快約一倍
+            if not cv2.imwrite(str(output_path), frame, [cv2.IMWRITE_PNG_COMPRESSION, SCREENSHOT_PNG_COMPRESSION]):
+                raise OSError(f"cv2.imwrite 回傳失敗：{output_path}")
         except Exception as exc:
             self.append_log(f"截圖失敗：{exc}")
             messagebox.showerror("截圖失敗", f"無法儲存截圖：{exc}")
@@ -792,8 +1081,22 @@ class AutoaApp:
         self.append_log(f"已儲存截圖：{output_path}")
         messagebox.showinfo("截圖完成", f"已儲存至 {output_path}")
 
+    def _has_template(self, path: Path) -> bool:
+        """以目錄掃描結果判斷模板是否存在；每個目錄只在首次查詢或重新掃描後讀取一次"""
+        names = self._template_dir_names.get(path.parent)
+        if names is None:
+            try:
+                with os.scandir(path.parent) as entries:
+                    names = {entry.name.casefold() for entry in entries if entry.is_file()}
+            except OSError:
+                names = set()
+            self._template_dir_names[path.parent] = names
+        return path.name.casefold() in names
+
     def handle_verify_templates(self) -> None:
-        missing = [str(path) for path in self._template_paths() if not path.exists()]
+        # 使用者主動檢查時重新掃描，之後的存在性判斷都沿用這次結果
+        self._template_dir_names.clear()
+        missing = [str(path) for path in self._template_paths() if not self._has_template(path)]
         if missing:
             text = "缺少下列模板檔案，請確認 templates 目錄：\n" + "\n".join(missing)
             self.append_log("模板檢查失敗。")
@@ -803,25 +1106,35 @@ class AutoaApp:
             messagebox.showinfo("模板檢查", "所有必要模板檔案皆存在。")
 
     def handle_test_open_friend_menu(self) -> None:
-        if not self.friend_list_template.exists():
+        if not self._has_template(self.friend_list_template):
             messagebox.showwarning("測試模板", f"找不到模板：{self.friend_list_template}")
             self.append_log("測試模板缺失，無法進行好友選單測試。")
             return
 
         try:
-            import pyautogui
+            pyautogui = self._require_pyautogui()
         except ImportError as exc:
             messagebox.showerror("測試失敗", f"無法載入 pyautogui：{exc}")
             return
 
+        if not self._job_idle.is_set():
+            messagebox.showinfo("測試", "目前有工作正在進行中，請稍候。")
+            return
+
+        # 截圖與模板比對交給工作執行緒，避免卡住介面；換新的 stop_event，讓 _post_main 不受上次終止影響
+        self.stop_event = threading.Event()
+        self._submit_job(lambda: self._test_open_friend_menu_worker(pyautogui))
+
+    def _test_open_friend_menu_worker(self, pyautogui: Any) -> None:
+        """好友選單測試的 Worker 方法，結果以對話框回報到主執行緒"""
         if not self._focus_line_window(pyautogui):
-            messagebox.showwarning("測試失敗", "未偵測到 LINE 視窗。")
+            self._post_main(lambda: messagebox.showwarning("測試失敗", "未偵測到 LINE 視窗。"))
             return
 
         location = self._try_locate(pyautogui, self.friend_list_template, confidence=0.9)
         if location is None:
             self.append_log("未找到好友選單按鈕。")
-            messagebox.showwarning("測試結果", "未偵測到好友選單按鈕，請確認 LINE 介面。")
+            self._post_main(lambda: messagebox.showwarning("測試結果", "未偵測到好友選單按鈕，請確認 LINE 介面。"))
             return
 
         try:
@@ -829,11 +1142,11 @@ class AutoaApp:
             pyautogui.click(center.x, center.y)
         except Exception as exc:
             self.append_log(f"點擊好友選單失敗：{exc}")
-            messagebox.showerror("測試失敗", f"點擊好友選單按鈕失敗：{exc}")
+            self._post_main(lambda err=exc: messagebox.showerror("測試失敗", f"點擊好友選單按鈕失敗：{err}"))
             return
 
         self.append_log("好友選單測試完成。")
-        messagebox.showinfo("測試完成", "已嘗試點擊好友選單按鈕。")
+        self._post_main(lambda: messagebox.showinfo("測試完成", "已嘗試點擊好友選單按鈕。"))
 
     def handle_test_send_message(self) -> None:
         if self.message_text is None:
@@ -845,7 +1158,7 @@ class AutoaApp:
             return
 
         try:
-            import pyautogui
+            pyautogui = self._require_pyautogui()
         except ImportError as exc:
             messagebox.showerror("測試失敗", f"無法載入 pyautogui：{exc}")
             return
@@ -872,8 +1185,8 @@ class AutoaApp:
 
     def handle_cycle_friend_chats(self) -> None:
         """依序開啟聊天窗測試（新實現）"""
-        if self.friend_cycle_thread and self.friend_cycle_thread.is_alive():
-            messagebox.showinfo('聊天測試', '聊天測試正在進行中，請稍候。')
+        if not self._job_idle.is_set():
+            messagebox.showinfo('聊天測試', '目前有工作正在進行中，請稍候。')
             return
 
         # 獲取要發送的好友數量
@@ -898,28 +1211,24 @@ class AutoaApp:
 
         self.append_log(f'開始依序開啟聊天窗測試：目標處理 {friend_count} 位好友，每個好友延遲 {delay} 秒')
 
-        thread = threading.Thread(
-            target=self._cycle_friend_chats_worker_new,
-            args=(friend_count, delay),
-            daemon=True,
-        )
-        self.friend_cycle_thread = thread
-        thread.start()
+        # 換新的 stop_event，讓 _post_main 不受上次終止影響
+        self.stop_event = threading.Event()
+        self._submit_job(lambda: self._cycle_friend_chats_worker_new(friend_count, delay))
 
     def _cycle_friend_chats_worker_new(self, friend_count: int, delay: float) -> None:
         """依序開啟聊天窗的 Worker 方法"""
         try:
-            import pyautogui
+            pyautogui = self._require_pyautogui()
         except ImportError as exc:
             self.append_log(f"無法載入 pyautogui：{exc}")
-            self.root.after(0, lambda: messagebox.showerror('測試失敗', f'無法載入 pyautogui：{exc}'))
+            self._post_main(lambda err=exc: messagebox.showerror('測試失敗', f'無法載入 pyautogui：{err}'))
             return
 
         try:
             # 1. 聚焦 LINE 視窗
             if not self._focus_line_window(pyautogui):
                 self.append_log("未偵測到 LINE 視窗")
-                self.root.after(0, lambda: messagebox.showwarning('測試失敗', '未偵測到 LINE 視窗。'))
+                self._post_main(lambda: messagebox.showwarning('測試失敗', '未偵測到 LINE 視窗。'))
                 return
 
             # 2. 手動模式：要求用戶先手動選中第一個好友
@@ -951,13 +1260,11 @@ class AutoaApp:
                 time.sleep(delay)
 
             # 6. 完成報告
-            self.root.after(0, lambda: messagebox.showinfo('測試完成', f'已遍歷 {friend_count} 位好友'))
+            self._post_main(lambda: messagebox.showinfo('測試完成', f'已遍歷 {friend_count} 位好友'))
 
         except Exception as exc:
             self.append_log(f'聊天測試發生錯誤：{exc}')
-            self.root.after(0, lambda err=exc: messagebox.showerror('測試失敗', f'執行失敗：{err}'))
-        finally:
-            self.friend_cycle_thread = None
+            self._post_main(lambda err=exc: messagebox.showerror('測試失敗', f'執行失敗：{err}'))
 
     def _send_message_to_current_chat(
         self,
@@ -965,24 +1272,31 @@ class AutoaApp:
         message: str,
         image_path: str | None,
         dry_run: bool,
+        cube_box: tuple[int, int, int, int] | None = None,
     ) -> bool:
-        """發送訊息到當前打開的聊天窗口"""
+        """發送訊息到當前打開的聊天窗口
+
+        Args:
+            cube_box: 呼叫端剛定位到的訊息輸入框；提供時沿用，不再重新截圖比對
+        """
         try:
             # 0. 先確保 LINE 視窗在前景
             self.append_log("  → 確保 LINE 視窗在前景")
-            windows = pyautogui_module.getWindowsWithTitle("LINE")
-            if not windows:
+            window = self._line_window(pyautogui_module)
+            if window is None:
                 self.append_log("  ⚠ 未找到 LINE 視窗")
                 return False
 
-            window = windows[0]
             window.activate()
             if self._interruptible_sleep(0.5):  # 增加等待時間，確保視窗完全激活
                 return False
 
             # 1. 找到訊息輸入框（使用 message_cube.png 模板）
-            self.append_log("  → 偵測訊息輸入框")
-            message_cube_location = self._try_locate(pyautogui_module, self.message_cube_template, confidence=0.85)
+            if cube_box is not None:
+                message_cube_location = cube_box
+            else:
+                self.append_log("  → 偵測訊息輸入框")
+                message_cube_location = self._try_locate(pyautogui_module, self.message_cube_template, confidence=0.85)
 
             if not message_cube_location:
                 self.append_log("  ⚠ 未找到訊息輸入框")
@@ -1010,10 +1324,9 @@ class AutoaApp:
                 try:
                     import pyperclip
 
+                    # 不改用 typewrite 模擬按鍵：中文輸入法啟用時按鍵會被輸入法攔截組字
                     self.append_log("  → 準備複製訊息到剪貼簿")
-                    pyperclip.copy(message)
-                    if self._interruptible_sleep(0.2):
-                        return False
+                    pyperclip.copy(message)  # 同步寫入剪貼簿，不需額外等待
 
                     self.append_log("  → 貼上訊息")
                     pyautogui_module.hotkey('ctrl', 'v')
@@ -1032,29 +1345,11 @@ class AutoaApp:
                 abs_image_path = str(Path(image_path).absolute())
 
                 try:
-                    from PIL import Image
-                    import io
                     import win32clipboard
 
-                    # 打開圖片
-                    self.append_log(f"  → 讀取圖片文件")
-                    img = Image.open(abs_image_path)
-
-                    # 轉換為 RGB 模式（移除透明通道）
-                    if img.mode == 'RGBA':
-                        # 創建白色背景
-                        background = Image.new('RGB', img.size, (255, 255, 255))
-                        background.paste(img, mask=img.split()[3])  # 使用 alpha 通道作為 mask
-                        img = background
-                    elif img.mode != 'RGB':
-                        img = img.convert('RGB')
-
-                    # 將圖片轉換為 BMP 格式並複製到剪貼簿
+                    # 同一張圖片只解碼/編碼一次，之後的好友直接沿用 DIB 資料
                     self.append_log(f"  → 複製圖片到剪貼簿")
-                    output = io.BytesIO()
-                    img.save(output, 'BMP')
-                    data = output.getvalue()[14:]  # 移除 BMP 文件頭（14 字節）
-                    output.close()
+                    data = self._image_dib(abs_image_path)
 
                     # 複製到剪貼簿
                     win32clipboard.OpenClipboard()
@@ -1075,7 +1370,6 @@ class AutoaApp:
 
                 except Exception as e:
                     self.append_log(f"  ✗ 圖片附加失敗：{e}")
-                    import traceback
                     self.append_log(f"  詳細錯誤：{traceback.format_exc()}")
                     # 即使附加失敗，仍然繼續發送文字訊息
 
@@ -1426,6 +1720,31 @@ class AutoaApp:
         self._save_debug_screenshot(pyautogui_module, region, "both_arrows")
         return None
 
+    def _image_dib(self, image_path: str) -> bytes:
+        """將圖片轉為剪貼簿用的 DIB 資料；檔案未變動時直接使用記憶體中的結果"""
+        mtime = os.path.getmtime(image_path)
+        cached = self._dib_cache.get(image_path)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+
+        from PIL import Image
+        import io
+
+        self.append_log(f"  → 讀取圖片文件")
+        with Image.open(image_path) as img:
+            # 轉換為 RGB 模式（透明部分以白色背景填滿）
+            if img.mode == 'RGBA':
+                background = Image.new('RGB', img.size, (255, 255, 255))
+                background.paste(img, mask=img.split()[3])  # 使用 alpha 通道作為 mask
+                rgb = background
+            else:
+                rgb = img.convert('RGB')
+            output = io.BytesIO()
+            rgb.save(output, 'BMP')
+        data = output.getvalue()[14:]  # 移除 BMP 文件頭（14 字節）
+        self._dib_cache[image_path] = (mtime, data)
+        return data
+
     def _save_debug_screenshot(
         self,
         pyautogui_module: Any,
@@ -1565,6 +1884,97 @@ class AutoaApp:
         # 如果仍然失敗，返回 None（不保存截圖，由上層決定）
         return None
 
+    def _capture_bgr(
+        self,
+        pyautogui_module: Any,
+        region: tuple[int, int, int, int] | None = None,
+    ) -> np.ndarray:
+        """擷取螢幕為 3 通道 BGR 陣列；有 mss 時直接 BitBlt，不經過 PIL
+
+        Args:
+            region: (left, top, width, height)，為 None 時擷取主螢幕
+        """
+        if mss is not None:
+            # mss 的 alpha 位元組未定義（常為 0），去掉以免存成透明 PNG
+            return cv2.cvtColor(self._grab_bgra(region), cv2.COLOR_BGRA2BGR)
+
+        screenshot = pyautogui_module.screenshot(region=region)
+        return cv2.cvtColor(np.asarray(screenshot), cv2.COLOR_RGB2BGR)
+
+    def _grab_bgra(self, region: tuple[int, int, int, int] | None = None) -> np.ndarray:
+        """以本執行緒的 mss 實例擷取螢幕，回傳直接包裝原始緩衝區的 BGRA 陣列（不複製）"""
+        sct = getattr(self._thread_local, "sct", None)
+        if sct is None:
+            sct = mss.mss()
+            self._thread_local.sct = sct
+        if region is None:
+            monitor = sct.monitors[1]
+        else:
+            left, top, width, height = (int(value) for value in region)
+            monitor = {"left": left, "top": top, "width": width, "height": height}
+        raw = sct.grab(monitor)
+        return np.frombuffer(raw.bgra, np.uint8).reshape(raw.height, raw.width, 4)
+
+    def _capture_gray(
+        self,
+        pyautogui_module: Any,
+        region: tuple[int, int, int, int] | None = None,
+    ) -> np.ndarray:
+        """擷取螢幕並以一次 cvtColor 轉成灰階，不保留彩色畫面"""
+        if mss is not None:
+            return cv2.cvtColor(self._grab_bgra(region), cv2.COLOR_BGRA2GRAY)
+        # pyautogui 回傳 RGB，直接轉灰階，省去先轉 BGR 的一次完整掃描
+        return cv2.cvtColor(np.asarray(pyautogui_module.screenshot(region=region)), cv2.COLOR_RGB2GRAY)
+
+    def _grab_gray(
+        self,
+        pyautogui_module: Any,
+        region: tuple[int, int, int, int] | None = None,
+        max_age: float = FRAME_CACHE_TTL,
+    ) -> np.ndarray | None:
+        """取得灰階螢幕畫面；max_age 秒內的重複呼叫共用同一張截圖
+
+        Args:
+            region: (left, top, width, height)，為 None 時回傳整個畫面
+
+        Returns:
+            灰階畫面（或其區域切片），截圖失敗時為 None
+        """
+        with self._frame_lock:
+            cached = self._frame_cache
+            if cached is None or time.monotonic() - cached[0] >= max_age:
+                try:
+                    gray = self._capture_gray(pyautogui_module)
+                except Exception as exc:
+                    self.append_log(f"螢幕截圖失敗：{exc}")
+                    return None
+                cached = (time.monotonic(), gray)
+                self._frame_cache = cached
+
+        frame = cached[1]
+        if region is None:
+            return frame
+        left, top, width, height = (int(value) for value in region)
+        crop = frame[max(top, 0):top + height, max(left, 0):left + width]
+        if crop.size == 0:
+            return None
+        return crop
+
+    def _log_opencv_backends(self) -> None:
+        """啟動時記錄一次 OpenCV 版本與可用的加速後端，方便排查比對速度"""
+        ipp = cv2.ipp.getIppVersion() if cv2.ipp.useIPP() else "未啟用"
+        opencl = "可用" if cv2.ocl.haveOpenCL() else "不可用"
+        self.append_log(
+            f"OpenCV {cv2.__version__}：IPP {ipp}，OpenCL {opencl}，"
+            f"最佳化 {'開啟' if cv2.useOptimized() else '關閉'}，執行緒 {cv2.getNumThreads()}"
+        )
+
+    def _require_pyautogui(self) -> Any:
+        """回傳啟動時載入的 pyautogui，載入失敗時拋出 ImportError"""
+        if self._pyautogui is None:
+            raise ImportError(str(_PYAUTOGUI_IMPORT_ERROR))
+        return self._pyautogui
+
     def _match_template_cv(
         self,
         pyautogui_module: Any,
@@ -1572,43 +1982,182 @@ class AutoaApp:
         region: tuple[int, int, int, int],
         threshold: float = 0.78,
     ) -> tuple[int, int, int, int] | None:
-        try:
-            screenshot = pyautogui_module.screenshot(region=region)
-        except Exception as exc:
-            self.append_log(f"截圖區域 {region} 失敗：{exc}")
+        match = self._best_match(pyautogui_module, template_path, region)
+        if match is not None and match[1] >= threshold:
+            return match[0]
+        return None
+
+    def _best_match(
+        self,
+        pyautogui_module: Any,
+        template_path: Path,
+        region: tuple[int, int, int, int] | None,
+    ) -> tuple[tuple[int, int, int, int], float] | None:
+        """在區域（None 為全螢幕）內執行一次灰階模板比對，回傳最佳位置與分數"""
+        # 先載入模板：模板不存在時不必截圖
+        entry = self._load_template(template_path)
+        if entry is None or entry.is_blank:
+            return None
+
+        shot_gray = self._grab_gray(pyautogui_module, region)
+        if shot_gray is None:
+            self.append_log(f"截圖區域 {region} 失敗。")
             return None
+        tpl_gray = entry.gray
+        h, w = tpl_gray.shape[:2]
 
-        shot = np.array(screenshot)
-        if shot.ndim == 2:
-            shot_gray = shot
+        if shot_gray.shape[0] < h or shot_gray.shape[1] < w:
+            return None
+
+        # 畫面幾乎是純色（例如空白或載入中）時不可能有足夠分數，直接略過比對
+        if entry.match_method == cv2.TM_CCOEFF_NORMED:
+            shot_min, shot_max, _, _ = cv2.minMaxLoc(shot_gray)
+            shot_range = shot_max - shot_min
+            if shot_range <= FLAT_TEMPLATE_RANGE and shot_range * 2 < entry.dynamic_range:
+                return None
+
+        if entry.levels and shot_gray.size >= tpl_gray.size * PYRAMID_MIN_AREA_RATIO:
+            max_val, (x, y) = self._pyramid_match(shot_gray, entry)
+        elif entry.umat is not None and entry.match_method == cv2.TM_CCOEFF_NORMED and shot_gray.size >= OPENCL_MIN_PIXELS:
+            # OpenCL (T-API) 路徑：模板已在裝置上，只需上傳畫面；低紋理模板需要 _score_map 的亮度檢查，不走此路徑
+            result = cv2.matchTemplate(cv2.UMat(shot_gray), entry.umat, entry.match_method)
+            _, max_val, _, (x, y) = cv2.minMaxLoc(result)
         else:
-            shot_gray = cv2.cvtColor(shot, cv2.COLOR_RGB2GRAY)
+            out = self._result_buffer(shot_gray.shape[0] - h + 1, shot_gray.shape[1] - w + 1)
+            result = _score_map(shot_gray, tpl_gray, entry.match_method, out)
+            _, max_val, _, (x, y) = cv2.minMaxLoc(result)
+        origin_x, origin_y = (max(region[0], 0), max(region[1], 0)) if region is not None else (0, 0)
+        offset_x, offset_y = entry.offset
+        full_w, full_h = entry.size
+        return (origin_x + x - offset_x, origin_y + y - offset_y, full_w, full_h), float(max_val)
+
+    def _result_buffer(self, rows: int, cols: int) -> np.ndarray:
+        """取得本執行緒可重用的 float32 結果緩衝區視圖，只在需要更大空間時重新配置"""
+        size = rows * cols
+        buffer = getattr(self._thread_local, "result", None)
+        if buffer is None or buffer.size < size:
+            buffer = np.empty(size, np.float32)
+            self._thread_local.result = buffer
+        return buffer[:size].reshape(rows, cols)
+
+    @staticmethod
+    def _pyramid_match(shot_gray: np.ndarray, entry: TemplateEntry) -> tuple[float, tuple[int, int]]:
+        """先在縮小的畫面上粗比對，再只對候選位置附近做全解析度精比對
+
+        畫面夠大時使用模板最粗的一層（每層縮小一半），否則退回較細的層。
+        """
+        tpl_gray = entry.gray
+        h, w = tpl_gray.shape[:2]
+        level = len(entry.levels)
+        while level > 1 and shot_gray.size < tpl_gray.size * PYRAMID_MIN_AREA_RATIO * 4 ** (level - 1):
+            level -= 1
+        tpl_small = entry.levels[level - 1]
+        small_h, small_w = tpl_small.shape[:2]
+        scale = 1 << level
+        margin = PYRAMID_MARGIN << (level - 1)
+
+        shot_small = shot_gray
+        for _ in range(level):
+            shot_small = cv2.pyrDown(shot_small)
+        if shot_small.shape[0] < small_h or shot_small.shape[1] < small_w:
+            result = _score_map(shot_gray, tpl_gray, entry.match_method)
+            _, max_val, _, max_loc = cv2.minMaxLoc(result)
+            return max_val, max_loc
+
+        coarse = _score_map(shot_small, tpl_small, entry.match_method)
+        best_val = -1.0
+        best_loc = (0, 0)
+        for _ in range(PYRAMID_CANDIDATES):
+            _, coarse_val, _, (cx, cy) = cv2.minMaxLoc(coarse)
+            if coarse_val <= -1.0:
+                break
+
+            left = max(cx * scale - margin, 0)
+            top = max(cy * scale - margin, 0)
+            roi = shot_gray[top:cy * scale + h + margin, left:cx * scale + w + margin]
+            if roi.shape[0] >= h and roi.shape[1] >= w:
+                fine = _score_map(roi, tpl_gray, entry.match_method)
+                _, fine_val, _, (fx, fy) = cv2.minMaxLoc(fine)
+                if fine_val > best_val:
+                    best_val = fine_val
+                    best_loc = (left + fx, top + fy)
+
+            # 抑制此候選附近的粗比對分數，讓下一輪找其他位置
+            coarse[
+                max(cy - small_h // 2, 0):cy + small_h // 2 + 1,
+                max(cx - small_w // 2, 0):cx + small_w // 2 + 1,
+            ] = -1.0
+        return best_val, best_loc
+
+    def _load_template_gray(self, template_path: Path) -> np.ndarray | None:
+        entry = self._load_template(template_path)
+        return entry.gray if entry is not None else None
+
+    def _load_template(self, template_path: Path) -> TemplateEntry | None:
+        """讀取模板並轉為灰階，檔案未變動時直接使用記憶體中的結果"""
+        try:
+            mtime = template_path.stat().st_mtime
+        except OSError:
+            return None
 
-        tpl = cv2.imread(str(template_path), cv2.IMREAD_UNCHANGED)
+        cached = self._template_cache.get(template_path)
+        if cached is not None and cached.mtime == mtime:
+            return cached
+
+        # 以 imdecode 讀檔，避免 cv2.imread 無法處理非 ASCII 路徑
+        try:
+            tpl = cv2.imdecode(np.fromfile(str(template_path), dtype=np.uint8), cv2.IMREAD_UNCHANGED)
+        except OSError:
+            tpl = None
         if tpl is None:
             self.append_log(f"讀取模板 {template_path.name} 失敗。")
             return None
-        if tpl.ndim == 3:
+        full_h, full_w = tpl.shape[:2]
+        offset_x = offset_y = 0
+        if tpl.ndim == 3 and tpl.shape[2] == 4:
+            # 依 alpha 裁掉透明邊界，縮小比對矩陣
+            opaque = cv2.findNonZero(tpl[:, :, 3])
+            if opaque is not None:
+                offset_x, offset_y, crop_w, crop_h = cv2.boundingRect(opaque)
+                tpl = tpl[offset_y:offset_y + crop_h, offset_x:offset_x + crop_w]
+            tpl_gray = cv2.cvtColor(tpl, cv2.COLOR_BGRA2GRAY)
+        elif tpl.ndim == 3:
             tpl_gray = cv2.cvtColor(tpl, cv2.COLOR_BGR2GRAY)
         else:
             tpl_gray = tpl
-
-        if shot_gray.shape[0] < tpl_gray.shape[0] or shot_gray.shape[1] < tpl_gray.shape[1]:
-            return None
-
-        result = cv2.matchTemplate(shot_gray, tpl_gray, cv2.TM_CCOEFF_NORMED)
-        _, max_val, _, max_loc = cv2.minMaxLoc(result)
-        if max_val >= threshold:
-            x, y = max_loc
-            w, h = tpl_gray.shape[1], tpl_gray.shape[0]
-            return (region[0] + x, region[1] + y, w, h)
-        return None
+        tpl_gray = np.ascontiguousarray(tpl_gray)
+
+        levels: list[np.ndarray] = []
+        coarsest = tpl_gray
+        while len(levels) < PYRAMID_MAX_LEVELS and min(coarsest.shape[:2]) >= PYRAMID_MIN_TEMPLATE:
+            coarsest = cv2.pyrDown(coarsest)
+            levels.append(coarsest)
+        entry = TemplateEntry(
+            mtime=mtime,
+            gray=tpl_gray,
+            levels=tuple(levels),
+            stddev=float(tpl_gray.std()),
+            dynamic_range=int(tpl_gray.max()) - int(tpl_gray.min()),
+            offset=(offset_x, offset_y),
+            size=(full_w, full_h),
+            umat=cv2.UMat(tpl_gray) if cv2.ocl.useOpenCL() else None,
+        )
+        if entry.is_blank:
+            self.append_log(f"模板 {template_path.name} 幾乎沒有紋理（標準差 {entry.stddev:.1f}），比對時將略過。")
+        self._template_cache[template_path] = entry
+        return entry
 
     def _box_to_tuple(self, box: Any) -> tuple[int, int, int, int] | None:
         if box is None:
             return None
-        if hasattr(box, "left"):
+        # 常見情況：cv2 比對回傳的 (x, y, w, h) 或 pyautogui 的 Box，不逐一 hasattr/isinstance
+        if type(box) is tuple and len(box) == 4:
+            x, y, w, h = box
+            return int(x), int(y), int(w), int(h)
+        try:
             return int(box.left), int(box.top), int(box.width), int(box.height)
+        except AttributeError:
+            pass
         if isinstance(box, (tuple, list)) and len(box) >= 4:
             return int(box[0]), int(box[1]), int(box[2]), int(box[3])
         return None
@@ -1620,40 +2169,29 @@ class AutoaApp:
         *,
         region: tuple[int, int, int, int] | None = None,
         confidence: float = TEMPLATE_CONFIDENCE,
-    ) -> Any:
-        if not template_path.exists():
-            return None
-
-        base_kwargs: dict[str, Any] = {}
-        if region is not None:
-            base_kwargs['region'] = region
-
-        confidence_list: list[float | None] = []
-        if confidence is not None:
-            confidence_list.append(confidence)
-        confidence_list.append(None)
-
-        for conf in confidence_list:
-            for use_grayscale in (False, True):
-                kwargs = dict(base_kwargs)
-                if conf is not None:
-                    kwargs['confidence'] = max(min(conf, 0.98), 0.55)
-                if use_grayscale:
-                    kwargs['grayscale'] = True
-
-                try:
-                    return pyautogui_module.locateOnScreen(str(template_path), **kwargs)
-                except TypeError:
-                    kwargs.pop('confidence', None)
-                    try:
-                        return pyautogui_module.locateOnScreen(str(template_path), **kwargs)
-                    except Exception:
-                        # 靜默處理，這是正常的搜索過程
-                        pass
-                except Exception:
-                    # 靜默處理，這是正常的搜索過程
-                    pass
-
+    ) -> tuple[int, int, int, int] | None:
+        # 模板不存在時 _load_template 的 stat 會失敗並回傳 None，不需另外檢查
+        # 先在上次命中位置附近比對（限制在搜尋區域內），命中即不必掃描整個區域
+        last_hit = self._last_hits.get(template_path)
+        if last_hit is not None:
+            x, y, w, h = last_hit
+            left, top = x - LAST_HIT_MARGIN, y - LAST_HIT_MARGIN
+            right, bottom = x + w + LAST_HIT_MARGIN, y + h + LAST_HIT_MARGIN
+            if region is not None:
+                left, top = max(left, region[0]), max(top, region[1])
+                right, bottom = min(right, region[0] + region[2]), min(bottom, region[1] + region[3])
+            if right - left >= w and bottom - top >= h:
+                match = self._best_match(pyautogui_module, template_path, (left, top, right - left, bottom - top))
+                # 只有近乎完全相符時才沿用；分數僅略高於門檻時，畫面其他位置可能有更好的命中
+                if match is not None and match[1] >= max(confidence, LAST_HIT_CONFIDENCE):
+                    self._last_hits[template_path] = match[0]
+                    return match[0]
+
+        # 直接在共用的灰階截圖上比對一次，不再逐一嘗試 confidence/grayscale 組合
+        match = self._best_match(pyautogui_module, template_path, region)
+        if match is not None and match[1] >= confidence:
+            self._last_hits[template_path] = match[0]
+            return match[0]
         return None
 
     def _try_locate_all(
@@ -1723,24 +2261,34 @@ class AutoaApp:
         return []
 
     def _template_paths(self) -> Iterable[Path]:
-        # 只返回非 None 的模板路徑
-        if self.friend_list_template:
-            yield self.friend_list_template
-        if self.message_cube_template:
-            yield self.message_cube_template
+        # 只返回非 None 的模板路徑（於 _load_templates 時建立）
+        return self._template_path_list
+
+    def _line_window(self, pyautogui_module: Any) -> Any:
+        """取得 LINE 視窗；上次找到的視窗標題仍是 LINE 時直接沿用，不再列舉所有頂層視窗"""
+        window = self._line_window_cache
+        if window is not None:
+            try:
+                # 視窗已關閉時取不到標題（或拋出例外），即視為失效
+                if "LINE" in window.title:
+                    return window
+            except Exception:
+                pass
+        windows = pyautogui_module.getWindowsWithTitle("LINE")
+        self._line_window_cache = windows[0] if windows else None
+        return self._line_window_cache
 
     def _focus_line_window(self, pyautogui_module: Any) -> bool:
         try:
-            windows = pyautogui_module.getWindowsWithTitle("LINE")
+            window = self._line_window(pyautogui_module)
         except Exception as exc:
             self.append_log(f"取得 LINE 視窗失敗：{exc}")
             return False
 
-        if not windows:
+        if window is None:
             self.append_log("未找到 LINE 視窗。")
             return False
 
-        window = windows[0]
         try:
             # 如果視窗最小化，先還原
             if getattr(window, "isMinimized", False):
@@ -1760,12 +2308,10 @@ class AutoaApp:
     def _ensure_line_focus(self, pyautogui_module: Any) -> bool:
         """輕量級的 LINE 視窗焦點檢查和恢復"""
         try:
-            windows = pyautogui_module.getWindowsWithTitle("LINE")
-            if not windows:
+            window = self._line_window(pyautogui_module)
+            if window is None:
                 return False
 
-            window = windows[0]
-
             # 檢查視窗是否最小化
             if getattr(window, "isMinimized", False):
                 window.restore()
@@ -1782,15 +2328,14 @@ class AutoaApp:
     def _get_line_window_region(self, pyautogui_module: Any) -> tuple[int, int, int, int] | None:
         """獲取 LINE 視窗的區域範圍 (left, top, width, height)"""
         try:
-            windows = pyautogui_module.getWindowsWithTitle("LINE")
+            window = self._line_window(pyautogui_module)
         except Exception as exc:
             self.append_log(f"取得 LINE 視窗失敗：{exc}")
             return None
 
-        if not windows:
+        if window is None:
             return None
 
-        window = windows[0]
         try:
             left = getattr(window, "left", 0)
             top = getattr(window, "top", 0)
@@ -1811,8 +2356,8 @@ class AutoaApp:
             if not messagebox.askyesno("關閉程式", "流程仍在執行，確定要終止並關閉嗎？"):
                 return
             self.handle_stop()
-            if self.worker_thread is not None and self.worker_thread.is_alive():
-                self.worker_thread.join(timeout=2.0)
+            self._job_idle.wait(timeout=2.0)
+        self._job_queue.put(None)
         self.root.destroy()
 
 def launch_ui() -> None:
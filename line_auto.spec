@@ -40,6 +40,7 @@ hiddenimports = [
     'PIL._tkinter_finder',
     'numpy',
     'cv2',
+    'mss',
     'pyautogui',
     'pywinauto',
     'pytesseract',
@@ -0,0 +1,45 @@
+"""_score_map 低紋理模板（TM_SQDIFF_NORMED）比對的回歸測試。"""
+import unittest
+
+import cv2
+import numpy as np
+
+from autoa.ui import FLAT_TEMPLATE_STDDEV, _score_map
+
+
+def _flat_template() -> np.ndarray:
+    # 灰 200、標準差約 1.7、明暗差 32 的低紋理模板（不會被視為空白模板而略過）
+    rng = np.random.default_rng(0)
+    template = np.clip(np.rint(200 + rng.normal(0, 1.5, (30, 40))), 190, 210).astype(np.uint8)
+    template[0, 0] = 184
+    template[-1, -1] = 216
+    return template
+
+
+class FlatTemplateScoreMapTest(unittest.TestCase):
+    def test_template_is_flat_but_not_blank(self) -> None:
+        template = _flat_template()
+        self.assertLessEqual(template.std(), FLAT_TEMPLATE_STDDEV)
+        self.assertEqual(int(template.max()) - int(template.min()), 32)
+
+    def test_rejects_flat_background_of_different_brightness(self) -> None:
+        background = np.full((300, 400), 255, np.uint8)
+
+        scores = _score_map(background, _flat_template(), cv2.TM_SQDIFF_NORMED)
+
+        self.assertLess(scores.max(), 0.5)
+
+    def test_still_matches_itself(self) -> None:
+        template = _flat_template()
+        background = np.full((300, 400), 255, np.uint8)
+        background[100:130, 150:190] = template
+
+        scores = _score_map(background, template, cv2.TM_SQDIFF_NORMED)
+        _, max_val, _, max_loc = cv2.minMaxLoc(scores)
+
+        self.assertGreater(max_val, 0.99)
+        self.assertEqual(max_loc, (150, 100))
+
+
+if __name__ == "__main__":
+    unittest.main()